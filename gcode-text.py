@@ -24,7 +24,9 @@ import sys
 import argparse
 import csv
 import os
-import numbers
+import contextlib
+import copy
+import multiprocessing
 from typing import Any
 from io import StringIO
 from lxml import etree # type: ignore
@@ -56,6 +58,7 @@ class TextValues(Values):
         self.font_metrics = False
         self.rects = None
         self.file = None
+        self.jobs = 1
 
 
 def Args():
@@ -73,7 +76,7 @@ def Args():
     parser.add_argument('--sheer', action='store', type=float,
                         help='Oblique sheer amount')
     parser.add_argument('--font', action='store', type=str,
-                        help='SVG font file name',
+                        help='SVG or STF font file name',
                         default=None)
     parser.add_argument('-t', '--template', action='store',
                         help='Template file name',
@@ -96,21 +99,23 @@ def Args():
                         help='Number of columns of boxes')
     parser.add_argument('-v', '--value', action='store', type=float,
                         help='Initial text numeric value')
-    parser.add_argument('-n', '--number', action='store', type=float,
+    parser.add_argument('-n', '--number', action='store', type=int,
                         help='Number of numeric values')
     parser.add_argument('-T', '--text', action='store',
-                        help='Text string')
+                        help='Text string; blank lines are skipped')
     parser.add_argument('-a', '--align', action='store', type=str,
                         choices=['left', 'right', 'center'],
                         default=None)
     parser.add_argument('--font-metrics', action='store_true',
                         help='Use font metrics for strings instead of glyph metrics',
                         default=None)
+    parser.add_argument('-j', '--jobs', action='store', type=int,
+                        help='Number of processes drawing text in parallel')
     parser.add_argument('--dump-stf', action='store',
                         help='Dump font in STF format',
                         default=None)
     parser.add_argument('file', nargs='*',
-                        help='Text source files')
+                        help='Text source files; blank lines are skipped')
     args = parser.parse_args()
 
     if args.help:
@@ -124,8 +129,8 @@ def Args():
     return args
     
 
-def finite_rects(args):
-    return args.template is not None
+def finite_rects(values):
+    return values.rects is not None
 
 
 def load_template(template_file, values):
@@ -133,7 +138,7 @@ def load_template(template_file, values):
     with values.config_open(template_file) as file:
         template = json.load(file)
     if isinstance(template, list):
-        value.rects = template
+        values.rects = template
     elif isinstance(template, dict):
         values.handle_dict(template)
 
@@ -143,15 +148,16 @@ def load_template(template_file, values):
     if not isinstance(values.rects, list):
         print('template rects is not an array', file=sys.stderr)
         raise TypeError
-    for e in tuple(values.rects):
+    for e in values.rects:
         if not isinstance(e, list):
             print('rects element %s is not an array' % (e,), file=sys.stderr)
             raise TypeError
         if len(e) != 4:
             print('rects element %s does not contain four values' % (e,), file=sys.stderr)
             raise TypeError
-        for v in tuple(e):
-            if not isinstance(v, numbers.Number):
+        for v in e:
+            # JSON numbers load as int or float
+            if not isinstance(v, (int, float)):
                 print('rects value %r is not a number' % (v,), file=sys.stderr)
                 raise TypeError
 
@@ -171,23 +177,34 @@ def get_rect(values):
 
 def get_line(values):
     if values.value != None:
-        v = values.value
+        # Count in integers so long runs don't accumulate rounding
+        v = int(values.value)
         n = values.number
-        while finite_rects(values) or n > 0:
+        finite = finite_rects(values)
+        while finite or n > 0:
             yield "%d" % v
             n -= 1
             v += 1
+    # Blank lines are skipped rather than given a rectangle of their
+    # own, so each rectangle holds the next line with text in it
     if values.text != None:
         for l in values.text.splitlines():
-            yield l
+            if l.strip():
+                yield l
     for name in values.file:
         with open(name, "r", encoding='utf-8', errors='ignore') as f:
-            for l in f.readlines():
-                yield l.strip()
+            for l in f:
+                l = l.strip()
+                if l:
+                    yield l
 
 def text_path(gcode: GCode, m: Matrix, s: str):
-    draw = MatrixDraw(gcode.get_draw(), m)
-    gcode.font.text_path(s, draw)
+    if gcode.needs_lines():
+        # Decompose splines in glyph space so the results can be reused
+        gcode.font.text_lines(s, gcode, m, gcode.values.flatness)
+    else:
+        draw = MatrixDraw(gcode.get_draw(), m)
+        gcode.font.text_path(s, draw)
 
 def text_into_rect(gcode: GCode, r: Rect, s: str, values: TextValues):
     if gcode.values.rect:
@@ -264,6 +281,38 @@ def text_into_rect(gcode: GCode, r: Rect, s: str, values: TextValues):
 
     text_path(gcode, matrix, s)
 
+#
+# Drawing each rectangle only depends on the font and settings, so with
+# --jobs the rectangles are handed to a pool of forked processes. Each
+# draws into a string and captures any messages, and the results are
+# written out in sequence. When the G-code goes to stdout, messages
+# are captured along with it so they stay in the same order.
+#
+job_gcode: GCode
+job_values: TextValues
+job_stdout: bool
+
+def job_text_into_rect(job: tuple[Rect, str]) -> tuple[str, str]:
+    (rect, line) = job
+    f = StringIO()
+    messages = f if job_stdout else StringIO()
+    job_gcode.f = f
+    with contextlib.redirect_stdout(messages):
+        text_into_rect(job_gcode, rect, line, job_values)
+    if job_stdout:
+        return (f.getvalue(), '')
+    return (f.getvalue(), messages.getvalue())
+
+def jobs_text_into_rects(gcode: GCode, jobs, values: TextValues):
+    global job_gcode, job_values, job_stdout
+    job_gcode = copy.copy(gcode)
+    job_values = values
+    job_stdout = gcode.f is sys.stdout
+    with multiprocessing.get_context('fork').Pool(values.jobs) as pool:
+        for s, messages in pool.imap(job_text_into_rect, jobs, chunksize=16):
+            gcode.f.write(s)
+            sys.stdout.write(messages)
+
 def main():
     values = TextValues()
     args = Args()
@@ -276,9 +325,13 @@ def main():
 
     values.handle_args(args)
 
+    if values.flatness <= 0:
+        print('flatness %r must be greater than zero' % (values.flatness,), file=sys.stderr)
+        sys.exit(1)
+
     device = Device(values)
 
-    font = Font.svg_font(values.font, values)
+    font = Font.load(values.font, values)
 
     if args.dump_stf:
         with open(args.dump_stf, "w") as file:
@@ -289,20 +342,22 @@ def main():
     rect_gen = get_rect(values)
     line_gen = get_line(values)
 
+    # G-code is written a command at a time; give output files a
+    # large buffer so that turns into a few big writes
     output = sys.stdout
     if args.output != '-':
-        output = open(args.output, "w")
+        output = open(args.output, "w", buffering=1 << 20)
 
     gcode = GCode(output, device, values, font)
     gcode.start()
 
-    while True:
-        try:
-            rect = next(rect_gen)
-            line = next(line_gen)
+    # Worker processes are forked, since this script runs main when
+    # it is imported and so can't be re-imported by a fresh interpreter
+    if values.jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        jobs_text_into_rects(gcode, zip(rect_gen, line_gen), values)
+    else:
+        for rect, line in zip(rect_gen, line_gen):
             text_into_rect(gcode, rect, line, values)
-        except StopIteration:
-            break
 
     gcode.stop()
 
@@ -81,6 +81,9 @@ class Device:
     values: Values
 
     def __init__(self, values: Values):
+        # set_settings edits the values in place, so don't share
+        # the class default list between devices
+        self.setting_values = list(self.setting_values)
         if values.device:
             self.set_json_file(values.device, values)
 
@@ -125,11 +128,8 @@ class Device:
         if isinstance(settings, list):
             self.setting_values = settings
         else:
-            f = StringIO(settings)
-            reader = csv.reader(f, delimiter=",")
-            setting_values = []
-            for row in reader:
-                setting_values = row
+            rows = list(csv.reader(StringIO(settings), delimiter=","))
+            setting_values = rows[-1] if rows else []
             for i in range(min(len(setting_values), len(self.setting_values))):
                 self.setting_values[i] = setting_values[i]
 
@@ -337,6 +337,19 @@ class Matrix:
     def distance(self, p: Point) -> Point:
         return Point(self.xx * p.x + self.yx * p.y, self.xy * p.x + self.yy * p.y)
 
+    def offset(self, tx: float, ty: float) -> Matrix:
+        """Return a matrix that moves points by tx, ty before this one"""
+        origin = self.point(Point(tx, ty))
+        return Matrix(
+            xx=self.xx, xy=self.xy, x0=origin.x, yx=self.yx, yy=self.yy, y0=origin.y
+        )
+
+    def max_scale(self) -> float:
+        """Return the largest factor by which the matrix stretches a distance"""
+        s = self.xx * self.xx + self.xy * self.xy + self.yx * self.yx + self.yy * self.yy
+        det = self.xx * self.yy - self.xy * self.yx
+        return math.sqrt((s + math.sqrt(max(s * s - 4 * det * det, 0))) / 2)
+
 
 class Spline:
     a: Point
@@ -353,30 +366,87 @@ class Spline:
     def __str__(self) -> str:
         return "%s %s %s %s" % (self.a, self.b, self.c, self.d)
 
-    def de_casteljau(self) -> tuple[Spline, Spline]:
-        ab = self.a.lerp_half(self.b)
-        bc = self.b.lerp_half(self.c)
-        cd = self.c.lerp_half(self.d)
-        abbc = ab.lerp_half(bc)
-        bccd = bc.lerp_half(cd)
-        final = abbc.lerp_half(bccd)
-
-        return (Spline(self.a, ab, abbc, final), Spline(final, bccd, cd, self.d))
-
     #
-    # Return an upper bound on the error (squared * 16) that could
-    # result from approximating a spline as a line segment
-    # connecting the two endpoints
-    #
-    # From https://hcklbrrfnn.files.wordpress.com/2012/08/bez.pdf
+    # decompose_spline holds the subdivision and flatness tests
     #
+    def decompose(self, tolerance: float) -> tuple[Point, ...]:
+        ps = iter(
+            decompose_spline(
+                self.a.x, self.a.y, self.b.x, self.b.y,
+                self.c.x, self.c.y, self.d.x, self.d.y,
+                tolerance,
+            )
+        )
+        return tuple(Point(x, y) for x, y in zip(ps, ps))
+
+
+#
+# Find where one coordinate of a spline reaches a minimum or maximum
+# strictly between the end points, by solving for the values of t in
+# (0, 1) where its derivative is zero
+#
+
+
+def spline_extrema(p0: float, p1: float, p2: float, p3: float) -> tuple[float, ...]:
+    a = p3 - p0 + 3 * (p1 - p2)
+    b = 2 * (p0 - 2 * p1 + p2)
+    c = p1 - p0
+    if a == 0:
+        if b == 0:
+            return ()
+        roots: tuple[float, ...] = (-c / b,)
+    else:
+        disc = b * b - 4 * a * c
+        if disc < 0:
+            return ()
+        r = math.sqrt(disc)
+        roots = ((-b - r) / (2 * a), (-b + r) / (2 * a))
+    return tuple(t for t in roots if 0 < t < 1)
+
+
+#
+# Decompose a spline into points along it, returned as a flat list of
+# x, y coordinates ending with the last control point. Subdivision is
+# adaptive: a piece is emitted as soon as its control points lie close
+# enough to the chord that the curve stays within tolerance of it, so
+# gentle curves take only a few segments. This works on plain floats
+# with an explicit stack instead of allocating Spline and Point objects
+# at each step.
+#
 
-    def error_squared(self) -> float:
-        ux = 3 * self.b.x - 2 * self.a.x - self.d.x
-        uy = 3 * self.b.y - 2 * self.a.y - self.d.y
-        vx = 3 * self.c.x - 2 * self.d.x - self.a.x
-        vy = 3 * self.c.y - 2 * self.d.y - self.a.y
 
+def decompose_spline(
+    ax: float, ay: float,
+    bx: float, by: float,
+    cx: float, cy: float,
+    dx: float, dy: float,
+    tolerance: float,
+) -> list[float]:
+    tolerance_squared = tolerance * tolerance
+    error_limit = 16 * tolerance_squared
+    points: list[float] = []
+    stack = [(ax, ay, bx, by, cx, cy, dx, dy)]
+    while stack:
+        (ax, ay, bx, by, cx, cy, dx, dy) = stack.pop()
+
+        # The spline lies within the convex hull of its control points,
+        # so if all of them are within tolerance of the starting point,
+        # the whole spline is too and a single segment will do.
+        if (
+            (dx - ax) * (dx - ax) + (dy - ay) * (dy - ay) <= tolerance_squared
+            and (bx - ax) * (bx - ax) + (by - ay) * (by - ay) <= tolerance_squared
+            and (cx - ax) * (cx - ax) + (cy - ay) * (cy - ay) <= tolerance_squared
+        ):
+            points += (dx, dy)
+            continue
+
+        # An upper bound on the error (squared * 16) from approximating
+        # the spline as the segment connecting its end points, from
+        # https://hcklbrrfnn.files.wordpress.com/2012/08/bez.pdf
+        ux = 3 * bx - 2 * ax - dx
+        uy = 3 * by - 2 * ay - dy
+        vx = 3 * cx - 2 * dx - ax
+        vy = 3 * cy - 2 * dy - ay
         ux *= ux
         uy *= uy
         vx *= vx
@@ -385,13 +455,27 @@ class Spline:
             ux = vx
         if uy < vy:
             uy = vy
-        return ux + uy
-
-    def decompose(self, tolerance: float) -> tuple[Point, ...]:
-        if self.error_squared() <= 16 * tolerance * tolerance:
-            return (self.d,)
-        (s1, s2) = self.de_casteljau()
-        return s1.decompose(tolerance) + s2.decompose(tolerance)
+        if ux + uy <= error_limit:
+            points += (dx, dy)
+            continue
+
+        # Split in half with de Casteljau's algorithm; push the second
+        # half first so that the first half is decomposed first
+        abx = ax + (bx - ax) / 2
+        aby = ay + (by - ay) / 2
+        bcx = bx + (cx - bx) / 2
+        bcy = by + (cy - by) / 2
+        cdx = cx + (dx - cx) / 2
+        cdy = cy + (dy - cy) / 2
+        abbcx = abx + (bcx - abx) / 2
+        abbcy = aby + (bcy - aby) / 2
+        bccdx = bcx + (cdx - bcx) / 2
+        bccdy = bcy + (cdy - bcy) / 2
+        fx = abbcx + (bccdx - abbcx) / 2
+        fy = abbcy + (bccdy - abbcy) / 2
+        stack.append((fx, fy, bccdx, bccdy, cdx, cdy, dx, dy))
+        stack.append((ax, ay, abx, aby, abbcx, abbcy, fx, fy))
+    return points
 
 
 class LineDraw(Draw):
@@ -399,6 +483,7 @@ class LineDraw(Draw):
     chain: Draw
 
     def __init__(self, chain: Draw, tolerance: float) -> None:
+        super().__init__()
         self.chain = chain
         self.tolerance = tolerance
 
@@ -413,35 +498,51 @@ class LineDraw(Draw):
     def curve(
         self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float
     ) -> None:
-        s = Spline(
-            Point(self.last_x, self.last_y), Point(x1, y1), Point(x2, y2), Point(x3, y3)
+        ps = iter(
+            decompose_spline(self.last_x, self.last_y, x1, y1, x2, y2, x3, y3, self.tolerance)
         )
-        ps = s.decompose(self.tolerance)
-        for p in ps:
-            self.draw(p.x, p.y)
+        for x, y in zip(ps, ps):
+            self.draw(x, y)
 
 
 class MatrixDraw(Draw):
     matrix: Matrix
     chain: Draw
+    is_translate: bool
 
     def __init__(self, chain: Draw, matrix: Matrix) -> None:
         self.chain = chain
         self.matrix = matrix
+        # Identity and pure translation matrices skip the multiplies
+        self.is_translate = (
+            matrix.xx == 1 and matrix.yy == 1 and matrix.xy == 0 and matrix.yx == 0
+        )
 
     def move(self, x: float, y: float) -> None:
-        point = self.matrix.point(Point(x, y))
-        self.chain.move(point.x, point.y)
+        if self.is_translate:
+            self.chain.move(x + self.matrix.x0, y + self.matrix.y0)
+        else:
+            point = self.matrix.point(Point(x, y))
+            self.chain.move(point.x, point.y)
         super().move(x, y)
 
     def draw(self, x: float, y: float) -> None:
-        point = self.matrix.point(Point(x, y))
-        self.chain.draw(point.x, point.y)
+        if self.is_translate:
+            self.chain.draw(x + self.matrix.x0, y + self.matrix.y0)
+        else:
+            point = self.matrix.point(Point(x, y))
+            self.chain.draw(point.x, point.y)
         super().draw(x, y)
 
     def curve(
         self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float
     ) -> None:
+        if self.is_translate:
+            x0 = self.matrix.x0
+            y0 = self.matrix.y0
+            self.chain.curve(x1 + x0, y1 + y0, x2 + x0, y2 + y0, x3 + x0, y3 + y0)
+            super().curve(x1, y1, x2, y2, x3, y3)
+            return
         b = self.matrix.point(Point(x1, y1))
         c = self.matrix.point(Point(x2, y2))
         d = self.matrix.point(Point(x3, y3))
@@ -475,17 +576,23 @@ class MeasureDraw(Draw):
     def __str__(self) -> str:
         return "%f,%f - %f,%f" % (self.min_x, self.min_y, self.max_x, self.max_y)
 
+    #
+    # These are called for every point, so avoid the overhead
+    # of calling the min and max builtins
+    #
     def point(self, x: float, y: float) -> None:
-        self.min_x = min(self.min_x, x)
-        self.min_y = min(self.min_y, y)
-        self.max_x = max(self.max_x, x)
-        self.max_y = max(self.max_y, y)
+        if x < self.min_x:
+            self.min_x = x
+        if y < self.min_y:
+            self.min_y = y
+        if x > self.max_x:
+            self.max_x = x
+        if y > self.max_y:
+            self.max_y = y
 
     def smudge_point(self, x: float, y: float) -> None:
-        self.min_x = min(self.min_x, x - self.tolerance)
-        self.min_y = min(self.min_y, y - self.tolerance)
-        self.max_x = max(self.max_x, x + self.tolerance)
-        self.max_y = max(self.max_y, y + self.tolerance)
+        self.point(x - self.tolerance, y - self.tolerance)
+        self.point(x + self.tolerance, y + self.tolerance)
 
     def move(self, x: float, y: float) -> None:
         self.last_x = x
@@ -497,16 +604,33 @@ class MeasureDraw(Draw):
         self.last_x = x
         self.last_y = y
 
+    #
+    # Measure a spline exactly instead of decomposing it. A spline lies
+    # within the hull of its control points, so when the two inner
+    # control points are already inside the box, only the end points
+    # matter. Otherwise, add the points where it turns around in x or y.
+    #
     def curve(
         self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float
     ) -> None:
-        s = Spline(
-            Point(self.last_x, self.last_y), Point(x1, y1), Point(x2, y2), Point(x3, y3)
-        )
-        ps = s.decompose(self.tolerance)
-        for p in ps[:-1]:
-            self.point(p.x, p.y)
-        self.draw(ps[-1].x, ps[-1].y)
+        x0 = self.last_x
+        y0 = self.last_y
+        self.draw(x3, y3)
+        min_x = self.min_x
+        max_x = self.max_x
+        min_y = self.min_y
+        max_y = self.max_y
+        if (min_x <= x1 <= max_x and min_y <= y1 <= max_y and
+            min_x <= x2 <= max_x and min_y <= y2 <= max_y):
+            return
+        for t in spline_extrema(x0, x1, x2, x3) + spline_extrema(y0, y1, y2, y3):
+            s = 1 - t
+            a = s * s * s
+            b = 3 * s * s * t
+            c = 3 * s * t * t
+            d = t * t * t
+            self.point(a * x0 + b * x1 + c * x2 + d * x3,
+                       a * y0 + b * y1 + c * y2 + d * y3)
 
 
 from gcode_font import *
@@ -514,6 +638,7 @@ from gcode_font import *
 class GCode(Draw):
     f: Any
     device: Device
+    extra: tuple[float, ...]
 
     def __init__(self, f: Any, device: Device, values: Values, font: Font):
         self.f = f
@@ -522,53 +647,70 @@ class GCode(Draw):
         self.font = font
         if values.settings != None:
             device.set_settings(values.settings)
+        self.extra = self.extra_params()
 
+    #
+    # The output file does its own buffering, so write each command
+    # straight to it rather than going through print
+    #
     def start(self):
-        print("%s" % self.device.start, file=self.f, end="")
+        preamble = "%s" % self.device.start
         if self.device.settings != "":
-            print(
-                self.device.settings % tuple(self.device.setting_values),
-                file=self.f,
-                end="",
-            )
+            preamble += self.device.settings % tuple(self.device.setting_values)
         if self.values.mm:
-            print("%s" % self.device.mm, file=self.f, end="")
+            preamble += "%s" % self.device.mm
         else:
-            print("%s" % self.device.inch, file=self.f, end="")
+            preamble += "%s" % self.device.inch
+        self.f.write(preamble)
 
     def set_feed(self, feed: float) -> None:
         self.values.feed = feed
+        self.extra = self.extra_params()
         
     def set_speed(self, speed: float) -> None:
         self.values.speed = speed
+        self.extra = self.extra_params()
         
-    def extra_params(self):
-        extra = ()
+    #
+    # Feed and speed values appended to draw and curve commands; these
+    # only change through set_feed and set_speed, so the tuple is kept
+    # in self.extra rather than rebuilt for every command
+    #
+    def extra_params(self) -> tuple[float, ...]:
+        extra: tuple[float, ...] = ()
         if self.device.feed:
             extra += (self.values.feed,)
         if self.device.speed:
             extra += (self.values.speed,)
         return extra
 
+    #
+    # These are called for every point, so track the current position
+    # here instead of calling up to Draw
+    #
     def move(self, x: float, y: float):
-        print(self.device.move % (x, y), file=self.f, end="")
-        super().move(x, y)
+        self.f.write(self.device.move % (x, y))
+        self.last_x = x
+        self.last_y = y
 
     def draw(self, x: float, y: float):
-        s = self.device.draw % ((x, y) + self.extra_params())
-        print(s, file=self.f, end="")
-        super().draw(x, y)
+        self.f.write(self.device.draw % ((x, y) + self.extra))
+        self.last_x = x
+        self.last_y = y
 
     def curve(self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float):
-        s = self.device.curve % ((x1, y1, x2, y2, x3, y3) + self.extra_params())
-        print(s, file=self.f, end="")
-        super().curve(x1, y1, x2, y2, x3, y3)
+        self.f.write(self.device.curve % ((x1, y1, x2, y2, x3, y3) + self.extra))
+        self.last_x = x3
+        self.last_y = y3
 
     def stop(self):
-        print("%s" % self.device.stop, file=self.f, end="")
+        self.f.write("%s" % self.device.stop)
+
+    def needs_lines(self) -> bool:
+        return self.device.curve == "" or self.values.tesselate
 
     def get_draw(self):
-        if self.device.curve == "" or self.values.tesselate:
+        if self.needs_lines():
             return LineDraw(self, self.values.flatness)
         return self
 
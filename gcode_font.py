@@ -18,6 +18,9 @@
 
 from __future__ import annotations
 import math
+import array
+import functools
+import itertools
 import json
 import sys
 import argparse
@@ -90,6 +93,42 @@ class TextMetrics:
             ascent = self.ascent,
             descent = self.descent)
 
+#
+# Per-glyph metrics for a whole font, stored as one array per value
+# rather than one object per glyph. Glyphs are numbered in the order
+# they're added; 'index' maps from Unicode to that number.
+#
+class MetricsTable:
+    index: dict[int, int]
+    left_side_bearing: array.array
+    right_side_bearing: array.array
+    width: array.array
+    ascent: array.array
+    descent: array.array
+
+    def __init__(self) -> None:
+        self.index = {}
+        self.left_side_bearing = array.array('d')
+        self.right_side_bearing = array.array('d')
+        self.width = array.array('d')
+        self.ascent = array.array('d')
+        self.descent = array.array('d')
+
+    def add(self, ucs4: int, metrics: TextMetrics) -> None:
+        self.index[ucs4] = len(self.width)
+        self.left_side_bearing.append(metrics.left_side_bearing)
+        self.right_side_bearing.append(metrics.right_side_bearing)
+        self.width.append(metrics.width)
+        self.ascent.append(metrics.ascent)
+        self.descent.append(metrics.descent)
+
+    def lookup(self, s: str) -> list[int]:
+        """Map each character of s to its glyph number"""
+        index = self.index
+        # Fonts need not have a missing glyph, so only look for
+        # it when some character isn't in the font
+        return [index[c] if c in index else index[0] for c in map(ord, s)]
+
 svg_ns:str = '{http://www.w3.org/2000/svg}'
 
 def svg_tag(tag: str) -> str:
@@ -104,75 +143,336 @@ def chkfloat(f: float):
 def strtonum(s: str):
     return chkfloat(float(s))
 
+#
+# Convert an SVG elliptical arc to cubic splines, each covering at
+# most a quarter turn, so that glyphs only hold one kind of curve.
+# Returns a list of (control1, control2, end) points as complex
+# numbers, like svg.path uses.
+#
+def arc_to_cubics(arc: Arc) -> list[tuple[complex, complex, complex]]:
+    if arc.start == arc.end:
+        return []
+    if arc.radius.real == 0 or arc.radius.imag == 0:
+        return [(arc.start, arc.end, arc.end)]
+    cosr = math.cos(math.radians(arc.rotation))
+    sinr = math.sin(math.radians(arc.rotation))
+    radius = arc.radius * arc.radius_scale
+    rx = radius.real
+    ry = radius.imag
+
+    # Derivative of the arc with respect to angle
+    def tangent(a: float) -> complex:
+        return complex(-cosr * math.sin(a) * rx - sinr * math.cos(a) * ry,
+                       -sinr * math.sin(a) * rx + cosr * math.cos(a) * ry)
+
+    n = max(1, math.ceil(abs(arc.delta) / 90 - 1e-9))
+    step = math.radians(arc.delta) / n
+    k = 4 / 3 * math.tan(step / 4)
+    theta = math.radians(arc.theta)
+    curves = []
+    start = arc.start
+    for i in range(1, n + 1):
+        a0 = theta + step * (i - 1)
+        a1 = theta + step * i
+        end = arc.end if i == n else arc.point(i / n)
+        curves.append((start + k * tangent(a0), end - k * tangent(a1), end))
+        start = end
+    return curves
+
+#
+# Glyph outlines are stored packed, with one byte per operation in
+# 'ops' and all of the coordinates in a separate array. This avoids
+# allocating a Python object for every element of the outline.
+#
+# Operations are small integers so that Subpath.path can dispatch
+# through a table instead of comparing against each one in turn.
+# The end of the outline is implied by the end of the data, so
+# OP_END is never stored.
+#
+OP_MOVE = 0
+OP_LINE = 1
+OP_CURVE = 2
+OP_CURVE2 = 3
+OP_END = 4
+
+# Map between the outline operation names and their codes
+OP_CODES = {
+    'm': OP_MOVE,
+    'l': OP_LINE,
+    'c': OP_CURVE,
+    '2': OP_CURVE2,
+    'e': OP_END,
+}
+OP_NAMES = 'mlc2e'
+
+# Number of coordinates consumed by each operation
+OP_ARGS = (2, 2, 6, 4, 0)
+
+def quantize_tolerance(tolerance: float) -> float:
+    """Round tolerance down to one of eight steps per power of two"""
+    return 2 ** (math.floor(math.log2(tolerance) * 8) / 8)
+
+#
+# Record drawing operations in packed form
+#
+class PackDraw(Draw):
+    ops: bytearray
+    coords: array.array
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.ops = bytearray()
+        self.coords = array.array('d')
+
+    def move(self, x: float, y: float) -> None:
+        self.ops.append(OP_MOVE)
+        self.coords.append(x)
+        self.coords.append(y)
+        super().move(x, y)
+
+    def draw(self, x: float, y: float) -> None:
+        self.ops.append(OP_LINE)
+        self.coords.append(x)
+        self.coords.append(y)
+        super().draw(x, y)
+
+    def curve(
+        self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float
+    ) -> None:
+        self.ops.append(OP_CURVE)
+        self.coords.extend((x1, y1, x2, y2, x3, y3))
+        super().curve(x1, y1, x2, y2, x3, y3)
+
+
+#
+# A piece of a glyph outline, starting with a move and running up to
+# the next one. Glyphs often share pieces, like the base letter of
+# accented characters, so fonts keep only one copy of each.
+#
+class Subpath:
+    ops: bytes
+    coords: array.array
+    key: tuple[bytes, str, bytes]
+    hash: int
+
+    #
+    # Subpaths are never changed once built, and every lookup in the
+    # flatten cache hashes one, so the key and hash are computed here
+    #
+    def __init__(self, ops: bytes, coords: array.array) -> None:
+        self.ops = ops
+        self.coords = coords
+        self.key = (ops, coords.typecode, coords.tobytes())
+        self.hash = hash(self.key)
+
+    def __eq__(self, o) -> bool:
+        return isinstance(o, Subpath) and self.key == o.key
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def outline(self) -> tuple[str|int|float, ...]:
+        """Return the subpath in the original mixed op/coordinate form"""
+        outline: tuple[str|int|float, ...] = ()
+        i = 0
+        for op in self.ops:
+            outline += (OP_NAMES[op],)
+            n = OP_ARGS[op]
+            outline += tuple(chkfloat(v) for v in self.coords[i:i+n])
+            i += n
+        return outline
+
+    #
+    # Operation handlers. Each reads its coordinates starting at index
+    # i, draws using the provided callbacks, leaves the current point
+    # in pos and returns the index of the next operation's coordinates.
+    #
+    def path_move(self, calls: Draw, i: int, pos: list[float]) -> int:
+        x1 = self.coords[i]
+        y1 = self.coords[i+1]
+        pos[0] = x1
+        pos[1] = y1
+        calls.move(x1, y1)
+        return i + 2
+
+    def path_line(self, calls: Draw, i: int, pos: list[float]) -> int:
+        x1 = self.coords[i]
+        y1 = self.coords[i+1]
+        pos[0] = x1
+        pos[1] = y1
+        calls.draw(x1, y1)
+        return i + 2
+
+    def path_curve(self, calls: Draw, i: int, pos: list[float]) -> int:
+        coords = self.coords
+        x1 = coords[i+4]
+        y1 = coords[i+5]
+        pos[0] = x1
+        pos[1] = y1
+        calls.curve(coords[i], coords[i+1], coords[i+2], coords[i+3], x1, y1)
+        return i + 6
+
+    def path_curve2(self, calls: Draw, i: int, pos: list[float]) -> int:
+        #  Compute the equivalent cubic spline
+        coords = self.coords
+        x0 = pos[0]
+        y0 = pos[1]
+        _x1 = coords[i]
+        _y1 = coords[i+1]
+        x1 = coords[i+2]
+        y1 = coords[i+3]
+        x3 = x0 + 2 * (_x1 - x0) / 3
+        y3 = y0 + 2 * (_y1 - y0) / 3
+        x2 = x1 + 2 * (_x1 - x1) / 3
+        y2 = y1 + 2 * (_y1 - y1) / 3
+        pos[0] = x1
+        pos[1] = y1
+        calls.curve(x3, y3, x2, y2, x1, y1)
+        return i + 4
+
+    # Indexed by operation code
+    path_ops = (path_move, path_line, path_curve, path_curve2)
+
+    def path(self, calls: Draw, pos: list[float]) -> None:
+        path_ops = self.path_ops
+        i = 0
+
+        for op in self.ops:
+            i = path_ops[op](self, calls, i, pos)
+
+    @functools.lru_cache(maxsize=4096)
+    def flatten(self, tolerance: float) -> tuple[bytes, array.array]:
+        pack = PackDraw()
+        self.path(LineDraw(pack, tolerance), [0.0, 0.0])
+        return (bytes(pack.ops), pack.coords)
+
+
 class Glyph:
     ucs4: int
     metrics: TextMetrics
-    outline: tuple[str|int|float]
+    subpaths: tuple[Subpath, ...]
 
     def __init__(self, ucs4: int, width: float, outline: tuple[str|int|float], flatness: float = 1e-6):
         self.ucs4 = ucs4
-        self.outline = outline
+        self.subpaths = self.pack_outline(ucs4, outline)
+        self.validate()
         self.metrics = self.measure_ink(width, flatness)
 
-    def gen_value(self):
-        """Return the next element of the outlines array"""
-        for value in self.outline:
-            yield value
+    @classmethod
+    def pack_outline(cls, ucs4: int, outline: tuple[str|int|float]) -> tuple[Subpath, ...]:
+        """Split an outline into subpaths of operation codes and coordinates"""
+        subpaths: tuple[Subpath, ...] = ()
+        ops = bytearray()
+        values: list[int|float] = []
+        for value in outline:
+            if isinstance(value, str):
+                if value not in OP_CODES:
+                    print("unknown font op %s in glyph %d" % (value, ucs4), file=sys.stderr)
+                    raise ValueError
+                op = OP_CODES[value]
+                if (op == OP_MOVE or op == OP_END) and ops:
+                    subpaths += (Subpath(bytes(ops), cls.pack_coords(values)),)
+                    ops = bytearray()
+                    values = []
+                if op == OP_END:
+                    return subpaths
+                ops.append(op)
+            else:
+                values.append(value)
+        print("missing end in glyph %d" % ucs4, file=sys.stderr)
+        raise ValueError
 
     #
-    # Draw the glyph using the provide callbacks.
+    # Use the smallest array type that holds the coordinates exactly;
+    # most outlines use small integer coordinates that fit in a byte
     #
-    def path(self, calls: Draw) -> None:
-
-        x1 = 0
-        y1 = 0
-
-        value = self.gen_value()
+    @classmethod
+    def pack_coords(cls, values: list[int|float]) -> array.array:
+        if all(v == int(v) for v in values):
+            lo = min(values, default=0)
+            hi = max(values, default=0)
+            if -128 <= lo and hi <= 127:
+                return array.array('b', [int(v) for v in values])
+            if -32768 <= lo and hi <= 32767:
+                return array.array('h', [int(v) for v in values])
+        return array.array('d', values)
 
+    #
+    # Check the packed outline once when the glyph is created so
+    # that drawing it needs no checks
+    #
+    def validate(self) -> None:
+        x1: float = 0
+        y1: float = 0
         prev_op = None
-        while True:
-            op = next(value)
-
-            if op == "m":
-                if prev_op == op:
-                    print('Extra move in 0x%x' % self.ucs4)
-                _x1 = next(value)
-                _y1 = next(value)
-                if _x1 == x1 and _y1 == y1:
-                    print('gratuitous move in 0x%x to %f %f' % (self.ucs4, _x1, _y1))
-                x1 = _x1
-                y1 = _y1
-                calls.move(x1, y1)
-            elif op == "l":
-                x1 = next(value)
-                y1 = next(value)
-                calls.draw(x1, y1)
-            elif op == "c":
-                x3 = next(value)
-                y3 = next(value)
-                x2 = next(value)
-                y2 = next(value)
-                x1 = next(value)
-                y1 = next(value)
-                calls.curve(x3, y3, x2, y2, x1, y1)
-            elif op == "2":
-                #  Compute the equivalent cubic spline
-                _x1 = next(value)
-                _y1 = next(value)
-                x3 = x1 + 2 * (_x1 - x1) / 3
-                y3 = y1 + 2 * (_y1 - y1) / 3
-                x1 = next(value)
-                y1 = next(value)
-                x2 = x1 + 2 * (_x1 - x1) / 3
-                y2 = y1 + 2 * (_y1 - y1) / 3
-                calls.curve(x3, y3, x2, y2, x1, y1)
-            elif op == "e":
-                return
-            else:
-                print("unknown font op %s in glyph %d" % (op, self.ucs4))
+        for subpath in self.subpaths:
+            coords = subpath.coords
+            if sum(OP_ARGS[op] for op in subpath.ops) != len(coords):
+                print("wrong number of coordinates in glyph %d" % self.ucs4, file=sys.stderr)
                 raise ValueError
-                return
-            prev_op = op
+            i = 0
+            for op in subpath.ops:
+                if op == OP_MOVE:
+                    if prev_op == op:
+                        print('Extra move in 0x%x' % self.ucs4, file=sys.stderr)
+                    if coords[i] == x1 and coords[i+1] == y1:
+                        print('gratuitous move in 0x%x to %f %f' % (self.ucs4, x1, y1), file=sys.stderr)
+                i += OP_ARGS[op]
+                x1 = coords[i-2]
+                y1 = coords[i-1]
+                prev_op = op
+
+    def outline(self) -> tuple[str|int|float, ...]:
+        """Return the outline in the original mixed op/coordinate form"""
+        outline: tuple[str|int|float, ...] = ()
+        for subpath in self.subpaths:
+            outline += subpath.outline()
+        return outline + ('e',)
+
+    def stf(self) -> dict[str, Any]:
+        """Return the glyph in the form written to STF files"""
+        return {
+            "ucs4": self.ucs4,
+            "metrics": self.metrics,
+            "outline": self.outline(),
+        }
+
+    #
+    # Draw the glyph using the provide callbacks.
+    #
+    def path(self, calls: Draw) -> None:
+        pos = [0.0, 0.0]
+        for subpath in self.subpaths:
+            subpath.path(calls, pos)
+
+    #
+    # Draw the glyph as lines, decomposing splines to within tolerance
+    # (in glyph units) and transforming each point by matrix as it is
+    # emitted, without going through a MatrixDraw or building a list
+    # of transformed coordinates.
+    #
+    # The decomposed subpaths are cached; the tolerance is rounded down
+    # to one of a few values per power of two so that text drawn at
+    # similar sizes shares the cached results.
+    #
+    def flat_path(self, calls: Draw, tolerance: float, matrix: Matrix) -> None:
+        tolerance = quantize_tolerance(tolerance)
+        move = calls.move
+        draw = calls.draw
+        xx = matrix.xx
+        xy = matrix.xy
+        x0 = matrix.x0
+        yx = matrix.yx
+        yy = matrix.yy
+        y0 = matrix.y0
+        for subpath in self.subpaths:
+            (ops, coords) = subpath.flatten(tolerance)
+            c = iter(coords)
+            for op, x, y in zip(ops, c, c):
+                if op == OP_MOVE:
+                    move(xx * x + yx * y + x0, xy * x + yy * y + y0)
+                else:
+                    draw(xx * x + yx * y + x0, xy * x + yy * y + y0)
 
     def measure_ink(self, width: float, flatness: float) -> TextMetrics:
         measure_calls = MeasureDraw(flatness)
@@ -201,15 +501,62 @@ class Font:
     units_per_em: float
     x_height: float
     cap_height: float
+    subpaths: dict[Subpath, Subpath]
+    metrics_table: MetricsTable
+    pending: dict[int, list[tuple[int, float, tuple[str|int|float], float]]]
+    glyph_order: list[int]
 
     def __init__(self, units_per_em = 64):
         self.glyphs = {}
+        self.subpaths = {}
+        self.metrics_table = MetricsTable()
+        self.pending = {}
+        self.glyph_order = []
         self.units_per_em = units_per_em
 
+    def add_glyph(self, glyph: Glyph) -> None:
+        # Share identical subpaths with glyphs already in the font
+        subpaths = self.subpaths
+        glyph.subpaths = tuple(subpaths.setdefault(s, s) for s in glyph.subpaths)
+        self.glyphs[glyph.ucs4] = glyph
+        self.metrics_table.add(glyph.ucs4, glyph.metrics)
+
+    #
+    # Building a glyph measures its outline, which is expensive, so
+    # glyphs are saved by Unicode page and only built when something
+    # in the page is first used.
+    #
+    def defer_glyph(self, ucs4: int, width: float, outline: tuple[str|int|float], flatness: float) -> None:
+        page = ucs4 >> UCS_PAGE_SHIFT
+        self.pending.setdefault(page, []).append((ucs4, width, outline, flatness))
+        self.glyph_order.append(ucs4)
+
+    def load_page(self, page: int) -> None:
+        for (ucs4, width, outline, flatness) in self.pending.pop(page, []):
+            self.add_glyph(Glyph(ucs4, width, outline, flatness = flatness))
+
+    def load_text(self, s: str) -> None:
+        """Build the glyphs needed to draw s, including the missing glyph"""
+        if self.pending:
+            for page in {ord(c) >> UCS_PAGE_SHIFT for c in s} | {0}:
+                self.load_page(page)
+
+    def load_all(self) -> None:
+        for page in tuple(self.pending):
+            self.load_page(page)
+
     def glyph(self, ucs4: int) -> Glyph:
-        if ucs4 in self.glyphs:
-            return self.glyphs[ucs4]
-        return self.glyphs[0]
+        glyphs = self.glyphs
+        if ucs4 in glyphs:
+            return glyphs[ucs4]
+        page = ucs4 >> UCS_PAGE_SHIFT
+        if page in self.pending:
+            self.load_page(page)
+            return self.glyph(ucs4)
+        # Remember the missing glyph so later lookups hit directly
+        self.load_page(0)
+        glyphs[ucs4] = glyphs[0]
+        return glyphs[ucs4]
 
     #
     # Draw a single glyph using the provide callbacks.
@@ -236,28 +583,47 @@ class Font:
 
         return glyph_calls.offset_x
 
+    #
+    # Draw a sequence of glyphs transformed by matrix using only
+    # lines, keeping the result within flatness of the splines
+    #
+
+    def text_lines(self, s: str, calls: Draw, matrix: Matrix, flatness: float) -> float:
+        scale = matrix.max_scale()
+        if scale == 0:
+            # Everything lands on one point, so there's no glyph-space
+            # tolerance; decompose in output space instead
+            return self.text_path(s, MatrixDraw(LineDraw(calls, flatness), matrix))
+        tolerance = flatness / scale
+        glyphs = [self.glyph(ord(g)) for g in s]
+        xs = tuple(itertools.accumulate((glyph.metrics.width for glyph in glyphs), initial=0.0))
+
+        for glyph, x in zip(glyphs, xs):
+            # Spaces and other blank glyphs only advance the position
+            if glyph.subpaths:
+                glyph.flat_path(calls, tolerance, matrix.offset(x, 0))
+
+        return xs[-1]
+
     def text_metrics(self, s: str) -> TextMetrics:
-        x = 0.0
-        ret = TextMetrics()
-        started = False
-        for g in s:
-            glyph = self.glyph(ord(g))
-            m = glyph.metrics
-            if started:
-                ret.left_side_bearing = min(
-                    ret.left_side_bearing, m.left_side_bearing + x
-                )
-                ret.right_side_bearing = max(
-                    ret.right_side_bearing, m.right_side_bearing + x
-                )
-                ret.ascent = max(ret.ascent, m.ascent)
-                ret.descent = max(ret.descent, m.descent)
-                ret.width = max(ret.width, m.width + x)
-            else:
-                ret = m.copy()
-                started = True
-            x += m.width
-        return ret
+        table = self.metrics_table
+        left_side_bearing = table.left_side_bearing
+        right_side_bearing = table.right_side_bearing
+        width = table.width
+        ascent = table.ascent
+        descent = table.descent
+        self.load_text(s)
+        glyphs = table.lookup(s)
+        if not glyphs:
+            return TextMetrics()
+        # Position of each glyph along the baseline
+        xs = tuple(itertools.accumulate((width[i] for i in glyphs), initial=0.0))
+        return TextMetrics(
+            left_side_bearing = min(left_side_bearing[i] + x for i, x in zip(glyphs, xs)),
+            right_side_bearing = max(right_side_bearing[i] + x for i, x in zip(glyphs, xs)),
+            width = max(width[i] + x for i, x in zip(glyphs, xs)),
+            ascent = max(ascent[i] for i in glyphs),
+            descent = max(descent[i] for i in glyphs))
 
     def set_svg_face(self, element):
         for name, value in sorted(element.items()):
@@ -304,6 +670,12 @@ class Font:
                                 chkfloat(p.control1.real), chkfloat(-p.control1.imag),
                                 chkfloat(p.control2.real), chkfloat(-p.control2.imag),
                                 chkfloat(p.end.real), chkfloat(-p.end.imag))
+                elif isinstance(p, Arc):
+                    for (c1, c2, end) in arc_to_cubics(p):
+                        outline += ('c',
+                                    chkfloat(c1.real), chkfloat(-c1.imag),
+                                    chkfloat(c2.real), chkfloat(-c2.imag),
+                                    chkfloat(end.real), chkfloat(-end.imag))
                 elif isinstance(p, Close):
                     if cur_x != mov_x or cur_y != mov_y:
                         outline += ('l', chkfloat(mov_x), chkfloat(mov_y))
@@ -312,14 +684,18 @@ class Font:
         
         outline += ('e',)
 
-        self.glyphs[ucs4] = Glyph(ucs4, width, outline, flatness = self.units_per_em/1e5)
+        self.defer_glyph(ucs4, width, outline, self.units_per_em/1e5)
 
         return width
 
+    stf_keys = ('name', 'style', 'metadata', 'glyphs', 'ascent', 'descent',
+                'units_per_em', 'x_height', 'cap_height')
+
     def dump_stf(self, file) -> None:
-        d = self.__dict__.copy()
+        self.load_all()
+        d = {k: v for k, v in self.__dict__.items() if k in self.stf_keys}
         glyphs = d["glyphs"]
-        d["glyphs"] = tuple([glyphs[k] for k in glyphs])
+        d["glyphs"] = tuple([glyphs[k].stf() for k in dict.fromkeys(self.glyph_order)])
         json.dump(d, file, sort_keys=True, indent="\t", default=lambda o: o.__dict__)
 
     @classmethod
@@ -358,3 +734,60 @@ class Font:
                 print("Failed to load font (%s)" % exc)
                 sys.exit(1)
             return Font.parse_svg_font(svg_root)
+
+    #
+    # STF files hold the outlines already decomposed into font
+    # operations, so loading one skips parsing the SVG paths
+    #
+    @classmethod
+    def parse_stf_font(cls, d: dict[str, Any]) -> Font:
+        font = Font(units_per_em = d.get('units_per_em', 64))
+        for key in cls.stf_keys:
+            if key in d and key != 'glyphs':
+                setattr(font, key, d[key])
+        if 'metadata' in d:
+            font.metadata = tuple(d['metadata'])
+        for g in d['glyphs']:
+            font.defer_glyph(g['ucs4'], g['metrics']['width'], cls.drop_gratuitous_moves(g['outline']),
+                             font.units_per_em/1e5)
+        return font
+
+    #
+    # STF files may contain moves to the current point; skip those
+    # just as add_svg_glyph does when building the outline
+    #
+    @classmethod
+    def drop_gratuitous_moves(cls, outline: list[Any]) -> tuple[Any, ...]:
+        result: tuple[Any, ...] = ()
+        cur_x = 0
+        cur_y = 0
+        i = 0
+        while i < len(outline):
+            op = outline[i]
+            nargs = OP_ARGS[OP_CODES[op]] if op in OP_CODES else 0
+            args = tuple(outline[i+1:i+1+nargs])
+            i += 1 + nargs
+            if nargs:
+                if op == 'm' and args[0] == cur_x and args[1] == cur_y:
+                    continue
+                cur_x = args[-2]
+                cur_y = args[-1]
+            result += (op,) + args
+        return result
+
+    @classmethod
+    def stf_font(cls, filename: str, values: Values) -> Font:
+        with values.config_open(filename) as file:
+            try:
+                d = json.load(file)
+            except Exception as exc:
+                print("Failed to load font (%s)" % exc)
+                sys.exit(1)
+            return Font.parse_stf_font(d)
+
+    @classmethod
+    def load(cls, filename: str, values: Values) -> Font:
+        """Load a font, using the file name suffix to pick the format"""
+        if filename.endswith('.stf'):
+            return Font.stf_font(filename, values)
+        return Font.svg_font(filename, values)